@@ -1,125 +1,91 @@
 import streamlit as st
+import concurrent.futures
+import hashlib
+import html
 import json
 import os
-from datetime import datetime
+import re
+from datetime import datetime, timedelta
 from typing import Dict, List, Any
-import google.generativeai as genai
+import numpy as np
 from dotenv import load_dotenv
+from google.api_core.exceptions import DeadlineExceeded, ResourceExhausted, ServiceUnavailable
+from tenacity import retry, retry_if_exception_type, stop_after_attempt, wait_exponential
+
+# google.generativeai drags in the gRPC/protobuf stack (~500 ms and tens of
+# MB), so it is imported on first API use rather than at app startup.
+genai = None
+genai_caching = None
+
+def _load_genai():
+    global genai, genai_caching
+    if genai is None:
+        import google.generativeai as genai_module
+        from google.generativeai import caching as caching_module
+        genai = genai_module
+        genai_caching = caching_module
+    return genai
+
+# Transient Gemini failures (429/503/timeouts) are retried with exponential
+# backoff instead of immediately degrading to the keyword-only fallback.
+_gemini_retry = retry(
+    wait=wait_exponential(min=1, max=30),
+    stop=stop_after_attempt(5),
+    retry=retry_if_exception_type((ResourceExhausted, ServiceUnavailable, DeadlineExceeded)),
+    reraise=True,
+)
+
+# orjson is ~3-10x faster than stdlib json for the parse/dump hot paths;
+# fall back to stdlib when it is not installed.
+try:
+    import orjson
+
+    def _json_loads(s):
+        return orjson.loads(s)
+
+    def _json_dumps(obj) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+except ImportError:
+    orjson = None
+
+    def _json_loads(s):
+        return json.loads(s)
+
+    def _json_dumps(obj) -> bytes:
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode()
 
 # Load environment variables (.env for local; secrets recommended for deployment)
 load_dotenv()
 # For Streamlit Cloud, use: api_key = st.secrets["GEMINI_API_KEY"]
 api_key = os.getenv("GEMINI_API_KEY")
 
-def load_css():
-    st.markdown("""
-    <style>
-    .main-header { font-size: 2.5rem; color: #1f77b4; text-align: center; margin-bottom: 2rem; }
-    .section-header { font-size: 1.5rem; color: #2e86ab; margin-top: 2rem; margin-bottom: 1rem; border-bottom: 2px solid #2e86ab; padding-bottom: 0.5rem; }
-    .info-box {
-        background-color: #f0f2f6 !important;
-        color: #212529 !important;
-        padding: 1rem !important;
-        border-radius: 0.5rem !important;
-        border-left: 4px solid #2e86ab !important;
-        margin-bottom: 1rem !important;
-    }
-    .success-box {
-        background-color: #d4edda !important;
-        border: 1px solid #c3e6cb !important;
-        border-radius: 0.5rem !important;
-        padding: 1rem !important;
-        margin: 1rem 0 !important;
-        color: #212529 !important;
-    }
-    .legal-section {
-        background-color: #e8f4f8 !important;
-        color: #212529 !important;
-        padding: 1rem !important;
-        border-radius: 0.5rem !important;
-        margin-bottom: 0.5rem !important;
-    }
-    .accused-card {
-        background-color: #f8f9fa !important;
-        border: 1px solid #dee2e6 !important;
-        border-radius: 0.5rem !important;
-        padding: 1rem !important;
-        margin-bottom: 1rem !important;
-        color: #212529 !important;
-    }
-    </style>
-    """, unsafe_allow_html=True)
+# genai.configure mutates global SDK state; configuring once per process is
+# enough, so reruns (and any future manager instances) skip the repeat call.
+_configured_key = None
 
-class GeminiModelManager:
-    def __init__(self, api_key: str):
-        self.api_key = api_key
-        self.selected_model_name = None
-        self.configured = False
-        self._ensure_configured()
-    def _ensure_configured(self):
-        if self.api_key and self.api_key != "YOUR_API_KEY_HERE":
-            try:
-                genai.configure(api_key=self.api_key)
-                self.configured = True
-            except Exception:
-                self.configured = False
-    def list_models(self) -> List[str]:
-        if not self.configured:
-            return []
-        try:
-            models = genai.list_models()
-            return [m.name for m in models if getattr(m, "name", None)]
-        except Exception:
-            return []
-    def pick_working_model(self) -> str:
-        if not self.configured:
-            raise RuntimeError("Gemini API not configured")
-        models = self.list_models()
-        candidates = [name for name in models if "gemini" in name.lower()]
-        def score(n: str) -> float:
-            ver = 0.0
-            import re
-            m = re.search(r'(\d+(?:\.\d+)?)', n)
-            if m:
-                try: ver = float(m.group(1))
-                except Exception: ver = 0.0
-            return ver
-        candidates.sort(key=lambda x: score(x), reverse=True)
-        for candidate in candidates:
-            try:
-                model = genai.GenerativeModel(candidate)
-                test_response = model.generate_content("Hello")
-                self.selected_model_name = candidate
-                return candidate
-            except Exception:
-                continue
-        raise RuntimeError("No working Gemini model found for generateContent")
-    def get_selected_model(self) -> str:
-        if self.selected_model_name:
-            return self.selected_model_name
-        try:
-            self.selected_model_name = self.pick_working_model()
-            return self.selected_model_name
-        except Exception:
-            return ""
+def _configure_once(key: str):
+    global _configured_key
+    if _configured_key != key:
+        _load_genai().configure(api_key=key)
+        _configured_key = key
 
-class GeminiFIAnalyzer:
-    def __init__(self, api_key: str):
-        self.model_manager = GeminiModelManager(api_key)
-    
-    def analyze_with_gemini(self, fir_text: str) -> Dict[str, any]:
-        if not self.model_manager.configured:
-            return self._fallback_response("Gemini API not configured")
-        model_name = self.model_manager.get_selected_model()
-        if not model_name:
-            try:
-                model_name = self.model_manager.pick_working_model()
-            except Exception as e:
-                return self._fallback_response(f"Gemini model error: {str(e)}")
-        try:
-            model = genai.GenerativeModel(model_name)
-            prompt = f"""
-You are an AI legal expert specialized in Indian criminal law. Analyze the following FIR text and extract structured information. 
+# The stylesheet is fully static, so it lives in style.css and is read
+# from disk once per process instead of being rebuilt on every rerun.
+_CSS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "style.css")
+
+@st.cache_resource
+def _css() -> str:
+    with open(_CSS_PATH, encoding="utf-8") as f:
+        return "<style>\n" + f.read() + "</style>"
+
+def load_css():
+    st.markdown(_css(), unsafe_allow_html=True)
+
+# Static legal reference sent with every analysis. Kept as one block so it
+# can be uploaded once to Gemini's context cache and referenced by handle
+# instead of being re-billed per request.
+_LEGAL_REFERENCE = """
+You are an AI legal expert specialized in Indian criminal law. Analyze the following FIR text and extract structured information.
 Map the offences to the CORRECT legal sections from Bharatiya Nyaya Sanhita (BNS) 2023, which replaced the IPC.
 
 CRITICAL INSTRUCTION: Use ONLY BNS 2023 sections with their CORRECT definitions. DO NOT confuse IPC sections with BNS sections.
@@ -147,9 +113,12 @@ ARMS ACT, 1959:
 
 MOTOR VEHICLES ACT, 1988:
 - Section 66: Use of vehicle without registration or in violation of rules
+"""
 
-FIR TEXT:
-{fir_text}
+# Per-request prompt pieces, built once at import; _build_live_prompt is a
+# plain concatenation instead of re-rendering a ~2 KB f-string per call.
+_PROMPT_FIR_HEADER = '\nFIR TEXT:\n'
+_PROMPT_SUFFIX = """
 
 EXTRACTION REQUIREMENTS:
 1. Extract all relevant details: Complainant, Accused, Date/Time, Place, Vehicles, Weapons, Offences, Injuries, etc.
@@ -167,26 +136,26 @@ IMPORTANT:
 - If you're unsure about a section, provide your best legal reasoning
 
 OUTPUT FORMAT (JSON ONLY, NO MARKDOWN):
-{{
-    "extracted_info": {{
-        "Complainant": {{
+{
+    "extracted_info": {
+        "Complainant": {
             "Name": "string",
             "Father": "string",
             "Age": number,
             "Community": "string",
             "Occupation": "string",
             "Address": "string"
-        }},
+        },
         "DateTime": "string",
         "Place": "string",
-        "Accused": [{{
+        "Accused": [{
             "Name": "string",
             "Age": number,
             "Relation": "string",
             "Occupation": "string",
             "Address": "string",
             "History": "string"
-        }}],
+        }],
         "Vehicles": ["string"],
         "WeaponsUsed": ["string"],
         "Offences": ["string"],
@@ -195,8 +164,8 @@ OUTPUT FORMAT (JSON ONLY, NO MARKDOWN):
         "Threats": ["string"],
         "Witnesses": ["string"],
         "Impact": "string"
-    }},
-    "legal_mapping": {{
+    },
+    "legal_mapping": {
         "BNS 2023": [
             "Section XXX - Description: Explanation of why this section applies"
         ],
@@ -209,129 +178,824 @@ OUTPUT FORMAT (JSON ONLY, NO MARKDOWN):
         "Motor Vehicles Act, 1988": [
             "Section XX - Description: Explanation"
         ]
-    }},
+    },
     "legal_analysis": "Comprehensive analysis explaining: 1) What criminal acts occurred, 2) Which specific BNS 2023 sections apply and why (with correct section numbers), 3) Applicability of special acts (SC/ST, Arms, MVA), 4) Severity assessment, 5) Recommended charges"
-}}
+}
 
 Respond with ONLY the JSON object, no markdown formatting or code blocks.
 """
-            response = model.generate_content(prompt)
-            response_text = response.text.strip()
-            
-            # Clean up response text
-            response_text = response_text.replace('```json', '').replace('```', '').strip()
-            
-            # Extract JSON
-            start_idx = response_text.find('{')
-            end_idx = response_text.rfind('}') + 1
-            if start_idx != -1 and end_idx != 0:
-                json_text = response_text[start_idx:end_idx]
-            else:
-                json_text = response_text
-            
+
+# Structured-output schema mirroring the OUTPUT FORMAT block above. Passed
+# with response_mime_type="application/json" so Gemini returns conforming
+# JSON directly - no markdown fences, no prose, no wasted tokens on either.
+_RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "extracted_info": {
+            "type": "object",
+            "properties": {
+                "Complainant": {
+                    "type": "object",
+                    "properties": {
+                        "Name": {"type": "string"},
+                        "Father": {"type": "string"},
+                        "Age": {"type": "integer"},
+                        "Community": {"type": "string"},
+                        "Occupation": {"type": "string"},
+                        "Address": {"type": "string"},
+                    },
+                },
+                "DateTime": {"type": "string"},
+                "Place": {"type": "string"},
+                "Accused": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "Name": {"type": "string"},
+                            "Age": {"type": "integer"},
+                            "Relation": {"type": "string"},
+                            "Occupation": {"type": "string"},
+                            "Address": {"type": "string"},
+                            "History": {"type": "string"},
+                        },
+                    },
+                },
+                "Vehicles": {"type": "array", "items": {"type": "string"}},
+                "WeaponsUsed": {"type": "array", "items": {"type": "string"}},
+                "Offences": {"type": "array", "items": {"type": "string"}},
+                "Injuries": {"type": "string"},
+                "PropertyLoss": {"type": "array", "items": {"type": "string"}},
+                "Threats": {"type": "array", "items": {"type": "string"}},
+                "Witnesses": {"type": "array", "items": {"type": "string"}},
+                "Impact": {"type": "string"},
+            },
+        },
+        "legal_mapping": {
+            "type": "object",
+            "properties": {
+                "BNS 2023": {"type": "array", "items": {"type": "string"}},
+                "SC/ST Atrocities Act, 1989": {"type": "array", "items": {"type": "string"}},
+                "Arms Act, 1959": {"type": "array", "items": {"type": "string"}},
+                "Motor Vehicles Act, 1988": {"type": "array", "items": {"type": "string"}},
+            },
+        },
+        "legal_analysis": {"type": "string"},
+    },
+    "required": ["extracted_info", "legal_mapping", "legal_analysis"],
+}
+
+def _generation_config():
+    return _load_genai().types.GenerationConfig(
+        response_mime_type="application/json",
+        response_schema=_RESPONSE_SCHEMA,
+        max_output_tokens=8192,
+    )
+
+# Precompiled patterns for the model-version sort key and the fallback
+# vehicle-number extraction.
+_VER_DIGITS_RE = re.compile(r'\d+')
+_VEHICLE_RE = re.compile(r'[A-Z]{2}-\d{2}-[A-Z]{1,2}-\d{4}')
+
+def _version_key(name: str) -> tuple:
+    """Sort key giving true version-tuple ordering (2.10 > 2.9), which the
+    old float('2.10') == 2.1 parse got wrong."""
+    return tuple(int(p) for p in _VER_DIGITS_RE.findall(name))
+
+# Declarative fallback mapping: a hit on any keyword in the left set
+# appends the section under the given act. Extending the fallback is a
+# one-line table edit instead of a new if-block.
+_RULES = (
+    (frozenset({'robbery', 'snatched', 'forcibly took'}), "BNS 2023",
+     "Section 309(2) - Robbery: Forcible taking of property"),
+    (frozenset({'threatened', 'threat', 'intimidat'}), "BNS 2023",
+     "Section 351(2) - Criminal intimidation"),
+    (frozenset({'injury', 'hurt', 'injured', 'bleeding'}), "BNS 2023",
+     "Section 115(2) - Voluntarily causing hurt"),
+    (frozenset({'caste', 'scheduled caste', 'sc/st'}), "SC/ST Atrocities Act, 1989",
+     "Section 3(1)(r) - Intentional insult/abuse"),
+    (frozenset({'pistol', 'gun', 'firearm'}), "Arms Act, 1959",
+     "Section 25 - Possession/use of prohibited arms"),
+    (frozenset({'pistol', 'gun', 'firearm'}), "Arms Act, 1959",
+     "Section 27 - Use of arms in commission of offence"),
+)
+_WEAPON_KEYWORDS = ('knife', 'pistol', 'gun', 'rod', 'stick', 'weapon', 'firearm')
+# Weapons are matched case-insensitively on the original text with word
+# boundaries, so no lowered copy is needed and substrings like "gunk" or
+# "stickier" no longer count as hits.
+_WEAPONS_RE = re.compile(r'\b(' + '|'.join(_WEAPON_KEYWORDS) + r')\b', re.IGNORECASE)
+# Both scanners find every rule and weapon keyword in one linear pass over
+# the lowered FIR text: an Aho-Corasick automaton (Rust, SIMD-accelerated)
+# when ahocorasick_rs is installed, else the combined alternation regex
+# (longest keywords first).
+try:
+    import ahocorasick_rs
+except ImportError:
+    ahocorasick_rs = None
+_ALL_KEYWORDS = sorted(
+    frozenset().union(*(kws for kws, _, _ in _RULES)) | frozenset(_WEAPON_KEYWORDS),
+    key=len, reverse=True,
+)
+_KEYWORD_RE = re.compile('|'.join(map(re.escape, _ALL_KEYWORDS)))
+_KEYWORD_AC = ahocorasick_rs.AhoCorasick(_ALL_KEYWORDS) if ahocorasick_rs is not None else None
+
+def _keyword_hits(text_lower: str) -> set:
+    if _KEYWORD_AC is not None:
+        return {_ALL_KEYWORDS[i] for i, _, _ in _KEYWORD_AC.find_matches_as_indexes(text_lower)}
+    return set(_KEYWORD_RE.findall(text_lower))
+
+# Triage lexicon: much broader than the fallback-rule vocabulary above,
+# which only covers the handful of offences the keyword fallback can map.
+# Stems are matched as substrings on the lowered text and deliberately
+# permissive - a false accept costs one Gemini call, a false reject
+# discards a valid FIR before analysis.
+_TRIAGE_KEYWORDS = tuple(_ALL_KEYWORDS) + (
+    'theft', 'stole', 'stolen', 'burgl', 'dacoit', 'extort',
+    'murder', 'kill', 'death', 'stab', 'assault', 'attack', 'beat',
+    'rape', 'molest', 'harass', 'kidnap', 'abduct', 'dowry',
+    'fraud', 'cheat', 'forg', 'bribe', 'smuggl', 'trespass',
+    'accident', 'abuse', 'damage', 'wallet', 'phone',
+    'police', 'complaint', 'complainant', 'accused', 'witness',
+    'fir', 'offence', 'offense', 'crime', 'section',
+)
+_TRIAGE_RE = re.compile('|'.join(map(re.escape, sorted(set(_TRIAGE_KEYWORDS), key=len, reverse=True))))
+
+_JSON_DECODER = json.JSONDecoder()
+
+# Shared result-shape templates for the fallback paths. Materialized as
+# plain dicts (not MappingProxyType views) because results are serialized
+# to disk and the download button; string leaves are shared, the handful
+# of mutable leaves are copied.
+_EXTRACTED_SKELETON = {
+    "Complainant": {},
+    "DateTime": "",
+    "Place": "",
+    "Accused": [],
+    "Vehicles": [],
+    "WeaponsUsed": [],
+    "Offences": [],
+    "Injuries": "",
+    "PropertyLoss": [],
+    "Threats": [],
+    "Witnesses": [],
+    "Impact": "",
+}
+_LEGAL_MAPPING_ACTS = ("BNS 2023", "SC/ST Atrocities Act, 1989", "Arms Act, 1959", "Motor Vehicles Act, 1988")
+
+def _empty_extracted() -> Dict[str, Any]:
+    return {key: (value.copy() if isinstance(value, (dict, list)) else value)
+            for key, value in _EXTRACTED_SKELETON.items()}
+
+def _empty_legal_mapping() -> Dict[str, List[str]]:
+    return {act: [] for act in _LEGAL_MAPPING_ACTS}
+
+def _safe(value, limit: int = 64 * 1024) -> str:
+    """Guardrail for hostile or degenerate model output. Values end up in
+    f-strings rendered with unsafe_allow_html=True, so they are
+    HTML-escaped, and a field holding megabytes of text is truncated so
+    it cannot stall the frontend."""
+    s = str(value)
+    if len(s) > limit:
+        s = s[:limit] + f"... [{len(s) - limit} characters truncated]"
+    return html.escape(s)
+
+def _extract_json(s: str) -> str:
+    """Return the outermost ``{...}`` block of *s* in a single pass.
+
+    Tracks string/escape state so braces inside JSON strings do not
+    confuse the depth count, and skips ``` fences in place, replacing the
+    old .replace() + find/rfind sequence (3-4 full scans and two
+    intermediate copies) with one scan and one slice.
+    """
+    depth = 0
+    in_string = False
+    escape = False
+    start = -1
+    i = 0
+    n = len(s)
+    while i < n:
+        c = s[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif c == '\\':
+                escape = True
+            elif c == '"':
+                in_string = False
+        elif c == '`' and s[i:i + 3] == '```':
+            i += 3
+            continue
+        elif c == '"' and depth > 0:
+            in_string = True
+        elif c == '{':
+            if depth == 0:
+                start = i
+            depth += 1
+        elif c == '}':
+            if depth > 0:
+                depth -= 1
+                if depth == 0:
+                    return s[start:i + 1]
+        i += 1
+    return s
+
+# Picked-model disk cache: survives process restarts so new sessions skip
+# the list_models RPC and the per-candidate probe calls entirely.
+_MODEL_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "fir_analyser", "model.json")
+_MODEL_CACHE_TTL_SECONDS = 24 * 3600
+
+class GeminiModelManager:
+    def __init__(self, api_key: str):
+        self.api_key = api_key
+        self.selected_model_name = None
+        self.configured = False
+        self._models = None
+        self._model_instance = None
+        self._cached_model_instance = None
+        self._reference_cache = None
+        self._reference_cache_failed = False
+        self._ensure_configured()
+    def _ensure_configured(self):
+        if self.api_key and self.api_key != "YOUR_API_KEY_HERE":
             try:
-                result = json.loads(json_text)
-                result['timestamp'] = datetime.now().isoformat()
-                result['model_used'] = model_name
-                return result
-            except json.JSONDecodeError as e:
-                # Try to fix common JSON issues
-                return self.extract_from_text_response(response_text, fir_text, model_name)
+                _configure_once(self.api_key)
+                self.configured = True
+            except Exception:
+                self.configured = False
+    def _read_cached_model(self) -> str:
+        try:
+            with open(_MODEL_CACHE_PATH, "rb") as f:
+                payload = _json_loads(f.read())
+            if datetime.now().timestamp() - payload.get("saved_at", 0) < _MODEL_CACHE_TTL_SECONDS:
+                return payload.get("model", "")
+        except Exception:
+            pass
+        return ""
+    def _write_cached_model(self, name: str):
+        try:
+            os.makedirs(os.path.dirname(_MODEL_CACHE_PATH), exist_ok=True)
+            with open(_MODEL_CACHE_PATH, "wb") as f:
+                f.write(_json_dumps({"model": name, "saved_at": datetime.now().timestamp()}))
+        except Exception:
+            pass
+    def list_models(self) -> List[str]:
+        if not self.configured:
+            return []
+        if self._models is not None:
+            return self._models
+        try:
+            models = self._list_models()
+            self._models = [
+                m.name for m in models
+                if getattr(m, "name", None)
+                and "generateContent" in getattr(m, "supported_generation_methods", ("generateContent",))
+            ]
+            return self._models
+        except Exception:
+            return []
+    @_gemini_retry
+    def _list_models(self):
+        return list(genai.list_models())
+    def pick_working_model(self) -> str:
+        if not self.configured:
+            raise RuntimeError("Gemini API not configured")
+        cached = self._read_cached_model()
+        if cached:
+            # Validate only against an already-fetched model list; forcing
+            # the list_models RPC here would defeat the disk cache.
+            if self._models is None or cached in self._models:
+                self.selected_model_name = cached
+                return cached
+        models = self.list_models()
+        candidates = [name for name in models if "gemini" in name.lower()]
+        candidates.sort(key=_version_key, reverse=True)
+        if not candidates:
+            raise RuntimeError("No working Gemini model found for generateContent")
+        # No live "Hello" probe: list_models already filtered to models that
+        # advertise generateContent, and a genuinely broken pick surfaces
+        # through the normal fallback on the first real analysis.
+        self.selected_model_name = candidates[0]
+        self._write_cached_model(candidates[0])
+        return candidates[0]
+    def invalidate_selected_model(self):
+        """Forget the current pick (memory and disk) so the next analysis
+        re-discovers a model. Called when a Gemini call fails: a cached
+        name pointing at a retired or unauthorized model would otherwise
+        pin the app to the keyword fallback for the cache TTL."""
+        self.selected_model_name = None
+        self._model_instance = None
+        self._cached_model_instance = None
+        self._reference_cache = None
+        self._reference_cache_failed = False
+        try:
+            os.remove(_MODEL_CACHE_PATH)
+        except OSError:
+            pass
+    def get_selected_model(self) -> str:
+        if self.selected_model_name:
+            return self.selected_model_name
+        try:
+            self.selected_model_name = self.pick_working_model()
+            return self.selected_model_name
+        except Exception:
+            return ""
+    def get_model(self):
+        """One GenerativeModel per selected model: the constructor does
+        client setup worth skipping on every analysis, and reuse keeps the
+        underlying HTTP/gRPC channel warm."""
+        if self._model_instance is None:
+            name = self.get_selected_model()
+            if name:
+                self._model_instance = genai.GenerativeModel(name)
+        return self._model_instance
+    def get_cached_reference_model(self):
+        """Counterpart of get_model for the context-cached reference block;
+        expects only the live part of the prompt."""
+        if self._cached_model_instance is None:
+            reference_cache = self.get_reference_cache()
+            if reference_cache is not None:
+                self._cached_model_instance = genai.GenerativeModel.from_cached_content(reference_cache)
+        return self._cached_model_instance
+    def get_reference_cache(self):
+        """Create (once) a Gemini context cache for the static legal
+        reference, so those tokens are billed per TTL window instead of per
+        request. Returns None when the model/tier rejects the cache (e.g.
+        content below the minimum cached-token count) and remembers the
+        failure so we do not retry every analysis."""
+        if self._reference_cache is not None or self._reference_cache_failed:
+            return self._reference_cache
+        model_name = self.get_selected_model()
+        if not model_name:
+            self._reference_cache_failed = True
+            return None
+        try:
+            self._reference_cache = genai_caching.CachedContent.create(
+                model=model_name,
+                contents=[_LEGAL_REFERENCE],
+                ttl=timedelta(hours=1),
+            )
+        except Exception:
+            self._reference_cache_failed = True
+        return self._reference_cache
+
+@st.cache_resource(show_spinner=False)
+def get_manager(api_key: str) -> GeminiModelManager:
+    return GeminiModelManager(api_key)
+
+def _genai_batch_client():
+    # The Batch API ships in the newer google-genai SDK only; import lazily
+    # so the interactive app keeps working without it installed.
+    try:
+        from google import genai as genai_client
+    except ImportError as exc:
+        raise RuntimeError(
+            "Batch jobs require the google-genai package (pip install google-genai)"
+        ) from exc
+    return genai_client.Client(api_key=api_key)
+
+class GeminiFIAnalyzer:
+    def __init__(self, api_key: str):
+        self.model_manager = get_manager(api_key)
+    
+    def analyze_with_gemini(self, fir_text: str) -> Dict[str, any]:
+        if not self.model_manager.configured:
+            return self._fallback_response("Gemini API not configured")
+        model_name = self.model_manager.get_selected_model()
+        if not model_name:
+            try:
+                model_name = self.model_manager.pick_working_model()
+            except Exception as e:
+                return self._fallback_response(f"Gemini model error: {str(e)}")
+        try:
+            model = self.model_manager.get_cached_reference_model()
+            if model is not None:
+                prompt = self._build_live_prompt(fir_text)
+            else:
+                model = self.model_manager.get_model()
+                prompt = self._build_prompt(fir_text)
+            # Stream the generation so the user sees tokens as they arrive
+            # instead of waiting 10-20s for the full response.
+            stream = self._call_gemini(model, prompt, stream=True)
+            progress_area = st.empty()
+            chunks = []
+            for chunk in stream:
+                chunk_text = getattr(chunk, "text", "") or ""
+                if chunk_text:
+                    chunks.append(chunk_text)
+                    # Oversized chunks still count for parsing but skip the
+                    # live preview update so they cannot stall the UI.
+                    if len(chunk_text) <= 64 * 1024:
+                        progress_area.code(''.join(chunks)[-2000:])
+            progress_area.empty()
+            response_text = ''.join(chunks).strip()
+            return self._parse_result(response_text, fir_text, model_name)
         except Exception as e:
+            # The picked model may itself be the problem (retired or
+            # unauthorized); drop it so the next attempt re-discovers
+            # instead of failing identically for the cache TTL.
+            self.model_manager.invalidate_selected_model()
             return self._fallback_response(f"Gemini API error: {str(e)}")
-    
+
+    def _analyze_one(self, fir_text: str) -> Dict[str, any]:
+        """Non-streaming analyze_with_gemini variant with no Streamlit
+        elements, safe to call from worker threads where there is no
+        ScriptRunContext for the st.empty preview."""
+        if not self.model_manager.configured:
+            return self._fallback_response("Gemini API not configured")
+        model_name = self.model_manager.get_selected_model()
+        if not model_name:
+            return self._fallback_response("No working Gemini model found")
+        try:
+            model = self.model_manager.get_cached_reference_model()
+            if model is not None:
+                prompt = self._build_live_prompt(fir_text)
+            else:
+                model = self.model_manager.get_model()
+                prompt = self._build_prompt(fir_text)
+            response = self._call_gemini(model, prompt)
+            return self._parse_result(response.text.strip(), fir_text, model_name)
+        except Exception as e:
+            self.model_manager.invalidate_selected_model()
+            return self._fallback_response(f"Gemini API error: {str(e)}")
+
+    @_gemini_retry
+    def _call_gemini(self, model, prompt: str, stream: bool = False):
+        return model.generate_content(prompt, stream=stream, generation_config=_generation_config())
+
+    def _build_prompt(self, fir_text: str) -> str:
+        return _LEGAL_REFERENCE + self._build_live_prompt(fir_text)
+
+    def _build_live_prompt(self, fir_text: str) -> str:
+        """The per-request part of the prompt: FIR text plus extraction
+        instructions. Sent alone when the reference block is context-cached."""
+        return _PROMPT_FIR_HEADER + fir_text + _PROMPT_SUFFIX
+
+    def _parse_result(self, response_text: str, fir_text: str, model_name: str) -> Dict[str, any]:
+        result = None
+        start = response_text.find('{')
+        if start != -1:
+            # raw_decode parses greedily from the first brace in one
+            # C-backed pass and needs no end-of-object scan; _extract_json
+            # stays as the fallback for responses where prose or fences put
+            # stray braces ahead of the JSON.
+            try:
+                result, _ = _JSON_DECODER.raw_decode(response_text, start)
+            except json.JSONDecodeError:
+                result = None
+        if result is None:
+            try:
+                result = _json_loads(_extract_json(response_text))
+            except json.JSONDecodeError:
+                result = None
+        if not isinstance(result, dict):
+            # Try to fix common JSON issues
+            return self.extract_from_text_response(response_text, fir_text, model_name)
+        result['timestamp'] = datetime.now().isoformat()
+        result['model_used'] = model_name
+        return result
+
+    def analyze_many(self, fir_texts: List[str], max_concurrency: int = 4) -> List[Dict[str, any]]:
+        """Analyze a batch of FIRs with overlapping Gemini calls.
+
+        N sequential 10-20s calls collapse to roughly ceil(N / concurrency)
+        rounds; the pool size keeps in-flight requests under the API rate
+        limit. Results are returned in input order. Serves as the per-FIR
+        fallback of analyze_firs_batch when row-marshaling is not viable.
+        Threads rather than generate_content_async: the SDK's async client
+        caches a grpc.aio channel bound to the event loop it was created
+        on, so any scheme that runs a fresh loop per call breaks every
+        call after the first. _analyze_one also carries the retry backoff,
+        which the async call never had.
+        """
+        if not fir_texts:
+            return []
+        if len(fir_texts) == 1:
+            return [self._analyze_one(fir_texts[0])]
+        workers = min(max_concurrency, len(fir_texts))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(self._analyze_one, fir_texts))
+
+    # Keep marshaled prompts under ~8k input tokens (~4 chars each); past
+    # that, batch latency grows superlinearly and outputs risk truncation.
+    _BATCH_CHAR_BUDGET = 24000
+
+    def analyze_firs_batch(self, fir_texts: List[str]) -> List[Dict[str, any]]:
+        """Row-marshal several FIRs into one Gemini call.
+
+        One round-trip instead of N; oversized batches and any response
+        shape mismatch fall back to per-FIR analyze_with_gemini calls.
+        """
+        if not fir_texts:
+            return []
+        if len(fir_texts) == 1:
+            return [self._analyze_one(fir_texts[0])]
+        if sum(map(len, fir_texts)) > self._BATCH_CHAR_BUDGET:
+            # Over-budget batches go through the threaded per-FIR path,
+            # which overlaps the calls and, like _analyze_one, renders no
+            # Streamlit elements from worker threads.
+            return self.analyze_many(fir_texts)
+        if not self.model_manager.configured:
+            return [self._fallback_response("Gemini API not configured") for _ in fir_texts]
+        model_name = self.model_manager.get_selected_model()
+        if not model_name:
+            return [self._fallback_response("No working Gemini model found") for _ in fir_texts]
+        n = len(fir_texts)
+        sections = "\n\n".join(f"---FIR {i + 1}---\n{text}" for i, text in enumerate(fir_texts))
+        prompt = (
+            _LEGAL_REFERENCE
+            + f"\nAnalyze the following {n} FIRs. Return a JSON array of exactly {n} objects,"
+            " one per FIR in the same order, each in the schema below.\n\n"
+            + sections
+            + _PROMPT_SUFFIX
+        )
+        parsed = None
+        try:
+            # The structured-output config pins a single-object schema, so the
+            # array response is requested via the prompt instead.
+            response = self._call_gemini_unstructured(self.model_manager.get_model(), prompt)
+            text = response.text
+            start = text.find('[')
+            end = text.rfind(']') + 1
+            if start != -1 and end:
+                parsed = _json_loads(text[start:end])
+        except Exception:
+            parsed = None
+        if not isinstance(parsed, list) or len(parsed) != n:
+            return self.analyze_many(fir_texts)
+        timestamp = datetime.now().isoformat()
+        results = []
+        for item, text in zip(parsed, fir_texts):
+            if isinstance(item, dict):
+                item['timestamp'] = timestamp
+                item['model_used'] = model_name
+                results.append(item)
+            else:
+                results.append(self._analyze_one(text))
+        return results
+
+    @_gemini_retry
+    def _call_gemini_unstructured(self, model, prompt: str):
+        return model.generate_content(prompt)
+
+    def analyze_firs_parallel(self, fir_texts: List[str], max_workers: int = 8) -> List[Dict[str, any]]:
+        """Two-level batch scheme: partition the FIRs into row-marshaled
+        batches under the token budget, then run those batches on a bounded
+        thread pool. The workload is network-bound, so threads shrink wall
+        time until the API rate limit; transient 429s are already retried
+        with backoff inside the per-batch calls. Results keep input order.
+        """
+        if not fir_texts:
+            return []
+        batches = []
+        current, current_len = [], 0
+        for text in fir_texts:
+            if current and current_len + len(text) > self._BATCH_CHAR_BUDGET:
+                batches.append(current)
+                current, current_len = [], 0
+            current.append(text)
+            current_len += len(text)
+        if current:
+            batches.append(current)
+        if len(batches) == 1:
+            return self.analyze_firs_batch(batches[0])
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            per_batch = list(executor.map(self.analyze_firs_batch, batches))
+        return [result for batch in per_batch for result in batch]
+
+    def submit_batch(self, fir_texts: List[str]) -> str:
+        """Submit FIRs to the Gemini Batch API and return the job name.
+
+        Batch jobs are priced ~50% below interactive calls and do not
+        compete with the interactive rate limit, which suits large offline
+        FIR corpora better than the concurrent path.
+        """
+        model_name = self.model_manager.get_selected_model()
+        if not model_name:
+            raise RuntimeError("No working Gemini model found")
+        client = _genai_batch_client()
+        os.makedirs(_FIR_CACHE_DIR, exist_ok=True)
+        requests_path = os.path.join(_FIR_CACHE_DIR, "batch_requests.jsonl")
+        with open(requests_path, "w") as f:
+            for i, text in enumerate(fir_texts):
+                f.write(json.dumps({
+                    "key": str(i),
+                    "request": {"contents": [{"parts": [{"text": self._build_prompt(text)}]}]},
+                }) + "\n")
+        src = client.files.upload(file=requests_path, config={"mime_type": "application/jsonl"})
+        job = client.batches.create(model=model_name, src=src.name)
+        return job.name
+
+    def get_batch_results(self, batch_name: str):
+        """Poll a batch job; returns (state, results) with results None until
+        the job reaches JOB_STATE_SUCCEEDED."""
+        client = _genai_batch_client()
+        job = client.batches.get(name=batch_name)
+        state = getattr(job.state, "name", str(job.state))
+        if state != "JOB_STATE_SUCCEEDED":
+            return state, None
+        raw = client.files.download(file=job.dest.file_name)
+        model_name = self.model_manager.get_selected_model()
+        keyed = []
+        for line in raw.decode().splitlines():
+            if not line.strip():
+                continue
+            entry = _json_loads(line)
+            try:
+                text = entry["response"]["candidates"][0]["content"]["parts"][0]["text"]
+            except (KeyError, IndexError, TypeError):
+                keyed.append((entry.get("key", ""), self._fallback_response("Empty batch response")))
+                continue
+            keyed.append((entry.get("key", ""), self._parse_result(text.strip(), "", model_name)))
+        keyed.sort(key=lambda kv: int(kv[0]) if str(kv[0]).isdigit() else 0)
+        return state, [result for _, result in keyed]
+
+
     def extract_from_text_response(self, response_text: str, original_fir: str, model_name: str) -> Dict[str, any]:
-        extracted_info = {
-            "Complainant": {},
-            "DateTime": "",
-            "Place": "",
-            "Accused": [],
-            "Vehicles": [],
-            "WeaponsUsed": [],
-            "Offences": [],
-            "Injuries": "",
-            "PropertyLoss": [],
-            "Threats": [],
-            "Witnesses": [],
-            "Impact": ""
-        }
-        legal_mapping = {
-            "BNS 2023": [],
-            "SC/ST Atrocities Act, 1989": [],
-            "Arms Act, 1959": [],
-            "Motor Vehicles Act, 1988": []
-        }
+        extracted_info = _empty_extracted()
+        legal_mapping = _empty_legal_mapping()
         legal_analysis = f"Analysis completed with fallback method using model {model_name}. Please review the extracted information manually."
         
-        import re
         # Extract vehicle numbers
-        vehicles = re.findall(r'[A-Z]{2}-\d{2}-[A-Z]{1,2}-\d{4}', original_fir)
-        extracted_info["Vehicles"] = vehicles
-        
-        # Extract weapons
-        weapons_keywords = ['knife', 'pistol', 'gun', 'rod', 'stick', 'weapon', 'firearm']
-        for weapon in weapons_keywords:
-            if weapon in original_fir.lower():
-                extracted_info["WeaponsUsed"].append(weapon)
-        
+        extracted_info["Vehicles"] = _VEHICLE_RE.findall(original_fir)
+
+        # One lowercase copy and one scan identify every keyword hit; the
+        # rules table then dispatches on set intersections instead of
+        # rescanning the text per keyword group.
+        text_lower = original_fir.lower()
+        hit_keywords = _keyword_hits(text_lower)
+
+        found_weapons = {m.group(1).lower() for m in _WEAPONS_RE.finditer(original_fir)}
+        extracted_info["WeaponsUsed"] = [w for w in _WEAPON_KEYWORDS if w in found_weapons]
+
         # Basic legal mapping based on keywords
-        if any(word in original_fir.lower() for word in ['robbery', 'snatched', 'forcibly took']):
-            legal_mapping["BNS 2023"].append("Section 309(2) - Robbery: Forcible taking of property")
-        
-        if any(word in original_fir.lower() for word in ['threatened', 'threat', 'intimidat']):
-            legal_mapping["BNS 2023"].append("Section 351(2) - Criminal intimidation")
-        
-        if any(word in original_fir.lower() for word in ['injury', 'hurt', 'injured', 'bleeding']):
-            legal_mapping["BNS 2023"].append("Section 115(2) - Voluntarily causing hurt")
-        
-        if any(word in original_fir.lower() for word in ['caste', 'scheduled caste', 'sc/st']):
-            legal_mapping["SC/ST Atrocities Act, 1989"].append("Section 3(1)(r) - Intentional insult/abuse")
-        
-        if 'pistol' in original_fir.lower() or 'gun' in original_fir.lower() or 'firearm' in original_fir.lower():
-            legal_mapping["Arms Act, 1959"].append("Section 25 - Possession/use of prohibited arms")
-            legal_mapping["Arms Act, 1959"].append("Section 27 - Use of arms in commission of offence")
+        for keywords, act, section in _RULES:
+            if keywords & hit_keywords:
+                legal_mapping[act].append(section)
         
         return {
             "extracted_info": extracted_info,
             "legal_mapping": legal_mapping,
             "legal_analysis": legal_analysis,
             "timestamp": datetime.now().isoformat(),
-            "model_used": model_name
+            "model_used": model_name,
+            # Keyword-only salvage of an unparseable response: carries the
+            # real model name but must not be cached, or one malformed
+            # response would shadow later successful analyses.
+            "degraded": True
         }
     
     def _fallback_response(self, error_msg: str) -> Dict[str, any]:
+        extracted_info = _empty_extracted()
+        extracted_info["Complainant"] = {"Name": "Analysis Failed", "Error": error_msg}
+        extracted_info["DateTime"] = "N/A"
+        extracted_info["Place"] = "N/A"
+        extracted_info["Injuries"] = "N/A"
+        extracted_info["Impact"] = f"Analysis failed - {error_msg}"
         return {
-            "extracted_info": {
-                "Complainant": {"Name": "Analysis Failed", "Error": error_msg},
-                "DateTime": "N/A",
-                "Place": "N/A",
-                "Accused": [],
-                "Vehicles": [],
-                "WeaponsUsed": [],
-                "Offences": [],
-                "Injuries": "N/A",
-                "PropertyLoss": [],
-                "Threats": [],
-                "Witnesses": [],
-                "Impact": f"Analysis failed - {error_msg}"
-            },
-            "legal_mapping": {
-                "BNS 2023": [],
-                "SC/ST Atrocities Act, 1989": [],
-                "Arms Act, 1959": [],
-                "Motor Vehicles Act, 1988": []
-            },
+            "extracted_info": extracted_info,
+            "legal_mapping": _empty_legal_mapping(),
             "legal_analysis": f"Analysis could not be completed. Error: {error_msg}",
             "timestamp": datetime.now().isoformat(),
             "model_used": "none"
         }
 
+# Demo FIR shown by default; module-level so reruns do not rebuild it.
+_SAMPLE_FIR = """On 5th September 2025, at about 11:45 PM, I, Praveen Kumar, S/o Srinivas Rao, aged 35 years, belonging to BC community, working as a private school teacher, residing at Gandhi Nagar, Hyderabad, was returning home on my Hero Splendor motorcycle (TS-09-FQ-5678). Near the RTC Crossroads, two persons stopped me. One, later identified as Raju Singh, age around 32, resident of Malkajgiri, threatened me with a knife and demanded my wallet and phone. The other, Mohan, S/o Shankar, age 28, hit me on the arm with an iron rod and took my smartwatch worth ₹12,000.
+
+When I tried to shout for help, Raju threatened, "Reporting to police will get you and your family in trouble." Local tea stall owner Ramulu and auto driver Venkatesh witnessed the incident but were afraid to intervene.
+
+During the scuffle, my arm was injured. The accused escaped on a white Activa (TS-10-AB-3210). I suffered mental trauma and fear for my family's safety.
+
+ఈ దాడి వల్ల నాకు గాయాలు అయ్యాయి మరియు నాకు మానసిక భయంతో పాటు ఆస్తి నష్టం కూడా జరిగింది. నేను వెంటనే పోలీసుగా ఫిర్యాదు చేస్తున్నాను."""
+
+# Analyzed-FIR disk cache: identical inputs (e.g. the built-in sample) are
+# served from ~/.cache/fir_analyser/fir/{sha256}.json instead of a 10-20s
+# Gemini call. Lives next to model.json rather than under the process CWD,
+# which would litter the checkout when the app is run from it.
+_FIR_CACHE_DIR = os.path.join(os.path.dirname(_MODEL_CACHE_PATH), "fir")
+
+def _fir_cache_path(fir_hash: str) -> str:
+    return os.path.join(_FIR_CACHE_DIR, fir_hash + ".json")
+
+def _read_cached_result(fir_hash: str):
+    try:
+        with open(_fir_cache_path(fir_hash), "rb") as f:
+            return _json_loads(f.read())
+    except Exception:
+        return None
+
+def _write_cached_result(fir_hash: str, result: Dict[str, any]):
+    # Never persist fallback/error or degraded keyword-only responses; a
+    # transient failure should not shadow a later successful analysis.
+    if result.get("model_used") in (None, "", "none") or result.get("degraded"):
+        return
+    try:
+        os.makedirs(_FIR_CACHE_DIR, exist_ok=True)
+        with open(_fir_cache_path(fir_hash), "wb") as f:
+            f.write(_json_dumps(result))
+    except Exception:
+        pass
+
+def _drop_cached_result(fir_hash: str):
+    try:
+        os.remove(_fir_cache_path(fir_hash))
+    except OSError:
+        pass
+
+_SEMANTIC_CACHE_PATH = os.path.join(_FIR_CACHE_DIR, "semantic.npz")
+_EMBEDDING_MODEL = "models/text-embedding-004"
+# High threshold on purpose: legal mapping must not be reused across FIRs
+# that merely share phrasing, only across true near-duplicates.
+_SEMANTIC_SIM_THRESHOLD = 0.95
+
+class SemanticCache:
+    """Embedding-similarity cache for near-duplicate FIRs.
+
+    Keeps one Gemini embedding per previously analyzed FIR plus the hash of
+    its persisted result; a new FIR whose cosine similarity to a prior entry
+    meets the threshold reuses that result instead of a generateContent call.
+    """
+    def __init__(self, path: str = _SEMANTIC_CACHE_PATH, threshold: float = _SEMANTIC_SIM_THRESHOLD):
+        self.path = path
+        self.threshold = threshold
+        self.embeddings = None
+        self.hashes: List[str] = []
+        self._load()
+    def _load(self):
+        try:
+            data = np.load(self.path, allow_pickle=False)
+            self.embeddings = data["embeddings"]
+            self.hashes = data["hashes"].tolist()
+        except Exception:
+            self.embeddings = None
+            self.hashes = []
+    def _save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            np.savez(self.path, embeddings=self.embeddings, hashes=np.array(self.hashes))
+        except Exception:
+            pass
+    def embed(self, fir_text: str):
+        try:
+            vec = _load_genai().embed_content(model=_EMBEDDING_MODEL, content=fir_text)["embedding"]
+            return np.asarray(vec, dtype=np.float32)
+        except Exception:
+            return None
+    def lookup(self, embedding):
+        if embedding is None or self.embeddings is None or not self.hashes:
+            return None
+        norms = np.linalg.norm(self.embeddings, axis=1) * np.linalg.norm(embedding)
+        sims = self.embeddings @ embedding / np.maximum(norms, 1e-9)
+        best = int(np.argmax(sims))
+        if sims[best] >= self.threshold:
+            return _read_cached_result(self.hashes[best])
+        return None
+    def add(self, embedding, fir_hash: str):
+        if embedding is None:
+            return
+        row = embedding.reshape(1, -1)
+        self.embeddings = row if self.embeddings is None else np.vstack([self.embeddings, row])
+        self.hashes.append(fir_hash)
+        self._save()
+
+@st.cache_resource(show_spinner=False)
+def get_semantic_cache() -> SemanticCache:
+    return SemanticCache()
+
 class DharmaFIRAnalyzer:
     def __init__(self, api_key: str):
         self.gemini = GeminiFIAnalyzer(api_key)
-    def analyze_fir(self, fir_text: str) -> Dict[str, any]:
-        return self.gemini.analyze_with_gemini(fir_text)
-    def display_results(self, results: Dict[str, any]):
+    def _triage(self, fir_text: str) -> Dict[str, any]:
+        """Cheap local pre-filter: pasted noise and too-short inputs are
+        rejected immediately instead of spending 10-20s of Gemini quota.
+        Returns a fallback response for rejects, None to proceed."""
+        stripped = fir_text.strip()
+        if len(stripped) < 100:
+            return self.gemini._fallback_response(
+                "Input too short - please paste the full FIR text.")
+        lowered = stripped.lower()
+        # Telugu-script FIRs will not hit the English keyword list, so only
+        # demand keyword signal from predominantly ASCII input.
+        if lowered.isascii() and not _TRIAGE_RE.search(lowered):
+            return self.gemini._fallback_response(
+                "No criminal-keyword signal found - please review manually.")
+        return None
+    def analyze_fir(self, fir_text: str, force_refresh: bool = False) -> Dict[str, any]:
+        triaged = self._triage(fir_text)
+        if triaged is not None:
+            return triaged
+        fir_hash = hashlib.sha256(fir_text.strip().encode()).hexdigest()
+        if force_refresh:
+            _cached_analyze.clear()
+            _drop_cached_result(fir_hash)
+        # The model name participates in the cache key so a model switch
+        # invalidates in-process entries instead of serving stale results.
+        model_hint = self.gemini.model_manager.get_selected_model()
+        try:
+            return _cached_analyze(fir_hash, model_hint, fir_text, self)
+        except _AnalysisFailed as failed:
+            return failed.result
+    def display_results(self, results: Dict[str, any], slot: str = "main"):
         st.markdown('<div class="success-box">', unsafe_allow_html=True)
         st.success("✅ FIR Analysis Complete using Gemini AI!")
         if results.get('model_used'):
@@ -345,36 +1009,46 @@ class DharmaFIRAnalyzer:
         with tab3:
             self._display_detailed_analysis(results)
         with tab4:
-            self._display_summary(results)
+            self._display_summary(results, slot)
     def _display_extracted_info(self, extracted_info: Dict[str, Any]):
+        # Each column is assembled into one HTML string and emitted with a
+        # single st.markdown call: one frontend message instead of one per
+        # field, and the accused-card divs properly enclose their contents.
+        # Bind fields once up front: each .get is a dict lookup plus a
+        # default allocation, and this method runs on every rerun.
+        complainant = extracted_info.get('Complainant') or {}
+        accused_list = extracted_info.get('Accused') or []
+        date_time = extracted_info.get('DateTime', 'N/A')
+        place = extracted_info.get('Place', 'N/A')
+        injuries = extracted_info.get('Injuries', 'N/A')
+        impact = extracted_info.get('Impact', 'N/A')
         col1, col2 = st.columns(2)
         with col1:
-            st.markdown('<div class="section-header">👤 Complainant Information</div>', unsafe_allow_html=True)
-            complainant = extracted_info.get('Complainant', {})
+            parts = ['<div class="section-header">👤 Complainant Information</div>']
             if complainant and 'Error' not in complainant:
                 for key, value in complainant.items():
                     if value:
-                        st.write(f"**{key}:** {value}")
+                        parts.append(f"<b>{_safe(key)}:</b> {_safe(value)}<br>")
             else:
-                st.write("No complainant information extracted")
-            st.markdown('<div class="section-header">📅 Incident Details</div>', unsafe_allow_html=True)
-            st.write(f"**Date & Time:** {extracted_info.get('DateTime', 'N/A')}")
-            st.write(f"**Place:** {extracted_info.get('Place', 'N/A')}")
-            st.write(f"**Injuries:** {extracted_info.get('Injuries', 'N/A')}")
-            st.write(f"**Impact:** {extracted_info.get('Impact', 'N/A')}")
+                parts.append("No complainant information extracted")
+            parts.append('<div class="section-header">📅 Incident Details</div>')
+            parts.append(f"<b>Date & Time:</b> {_safe(date_time)}<br>")
+            parts.append(f"<b>Place:</b> {_safe(place)}<br>")
+            parts.append(f"<b>Injuries:</b> {_safe(injuries)}<br>")
+            parts.append(f"<b>Impact:</b> {_safe(impact)}")
+            st.markdown(''.join(parts), unsafe_allow_html=True)
         with col2:
-            st.markdown('<div class="section-header">🚨 Accused Persons</div>', unsafe_allow_html=True)
-            accused_list = extracted_info.get('Accused', [])
+            parts = ['<div class="section-header">🚨 Accused Persons</div>']
             if accused_list:
                 for accused in accused_list:
-                    st.markdown(f'<div class="accused-card">', unsafe_allow_html=True)
-                    st.write(f"**Name:** {accused.get('Name', 'N/A')}")
+                    card = [f"<b>Name:</b> {_safe(accused.get('Name', 'N/A'))}<br>"]
                     for key, value in accused.items():
                         if key != 'Name' and value:
-                            st.write(f"  **{key}:** {value}")
-                    st.markdown('</div>', unsafe_allow_html=True)
+                            card.append(f"<b>{_safe(key)}:</b> {_safe(value)}<br>")
+                    parts.append(f'<div class="accused-card">{"".join(card)}</div>')
             else:
-                st.write("No accused information extracted")
+                parts.append("No accused information extracted")
+            st.markdown(''.join(parts), unsafe_allow_html=True)
     def _display_legal_mapping(self, legal_mapping: Dict[str, List[str]]):
         st.markdown('<div class="section-header">⚖️ Legal Sections Applied</div>', unsafe_allow_html=True)
         if not legal_mapping or all(not sections for sections in legal_mapping.values()):
@@ -384,63 +1058,48 @@ class DharmaFIRAnalyzer:
             if sections:
                 st.subheader(f"{act}")
                 for section in sections:
-                    st.markdown(f'<div class="legal-section">{section}</div>', unsafe_allow_html=True)
+                    st.markdown(f'<div class="legal-section">{_safe(section)}</div>', unsafe_allow_html=True)
+    @staticmethod
+    def _bullet_list(items: List[str], empty_text: str) -> str:
+        return "\n".join(f"- {_safe(item)}" for item in items) if items else empty_text
+
     def _display_detailed_analysis(self, results: Dict[str, any]):
+        # One pre-joined markdown block per column: a single frontend
+        # message instead of one st.write per bullet.
         extracted_info = results.get('extracted_info', {})
+        offences = extracted_info.get('Offences') or []
+        vehicles = extracted_info.get('Vehicles') or []
+        weapons = extracted_info.get('WeaponsUsed') or []
+        witnesses = extracted_info.get('Witnesses') or []
+        property_loss = extracted_info.get('PropertyLoss') or []
+        threats = extracted_info.get('Threats') or []
         col1, col2 = st.columns(2)
         with col1:
-            st.markdown('<div class="section-header">⚖️ Offences & Evidence</div>', unsafe_allow_html=True)
-            st.write("**Offences Identified:**")
-            offences = extracted_info.get('Offences', [])
-            if offences:
-                for offence in offences:
-                    st.write(f"• {offence}")
-            else:
-                st.write("No specific offences identified")
-            st.write("**🚗 Vehicles:**")
-            vehicles = extracted_info.get('Vehicles', [])
-            if vehicles:
-                for v in vehicles:
-                    st.write(f"- {v}")
-            else:
-                st.write("- No vehicles identified")
-            st.write("**🔫 Weapons Used:**")
-            weapons = extracted_info.get('WeaponsUsed', [])
-            if weapons:
-                for w in weapons:
-                    st.write(f"- {w}")
-            else:
-                st.write("- No weapons identified")
+            lines = [
+                '<div class="section-header">⚖️ Offences & Evidence</div>',
+                "**Offences Identified:**",
+                self._bullet_list(offences, "No specific offences identified"),
+                "**🚗 Vehicles:**",
+                self._bullet_list(vehicles, "- No vehicles identified"),
+                "**🔫 Weapons Used:**",
+                self._bullet_list(weapons, "- No weapons identified"),
+            ]
+            st.markdown('\n\n'.join(lines), unsafe_allow_html=True)
         with col2:
-            st.markdown('<div class="section-header">👥 Witnesses & Impact</div>', unsafe_allow_html=True)
-            st.write("**Witnesses:**")
-            witnesses = extracted_info.get('Witnesses', [])
-            if witnesses:
-                for w in witnesses:
-                    st.write(f"• {w}")
-            else:
-                st.write("No witnesses identified")
-            st.write("**💰 Property Loss:**")
-            property_loss = extracted_info.get('PropertyLoss', [])
-            if property_loss:
-                for p in property_loss:
-                    st.write(f"- {p}")
-            else:
-                st.write("- No property loss identified")
-            st.write("**⚠️ Threats:**")
-            threats = extracted_info.get('Threats', [])
-            if threats:
-                for t in threats:
-                    st.write(f"• {t}")
-            else:
-                st.write("No specific threats identified")
-    def _display_summary(self, results: Dict[str, any]):
-        extracted_info = results.get('extracted_info', {})
-        legal_mapping = results.get('legal_mapping', {})
-        total_accused = len(extracted_info.get('Accused', []))
-        total_offences = len(extracted_info.get('Offences', []))
-        total_legal_sections = sum(len(sections) for sections in legal_mapping.values())
-        total_acts = sum(1 for sections in legal_mapping.values() if sections)
+            lines = [
+                '<div class="section-header">👥 Witnesses & Impact</div>',
+                "**Witnesses:**",
+                self._bullet_list(witnesses, "No witnesses identified"),
+                "**💰 Property Loss:**",
+                self._bullet_list(property_loss, "- No property loss identified"),
+                "**⚠️ Threats:**",
+                self._bullet_list(threats, "No specific threats identified"),
+            ]
+            st.markdown('\n\n'.join(lines), unsafe_allow_html=True)
+    def _display_summary(self, results: Dict[str, any], slot: str = "main"):
+        total_accused, total_offences, total_legal_sections, total_acts, json_bytes = _summary_blob(
+            results.get('timestamp', ''), slot, results
+        )
         col1, col2, col3, col4 = st.columns(4)
         with col1:
             st.metric("👤 Accused Persons", total_accused)
@@ -451,15 +1110,66 @@ class DharmaFIRAnalyzer:
         with col4:
             st.metric("📜 Acts Violated", total_acts)
         st.markdown("### 📝 Legal Analysis")
-        st.markdown(results.get('legal_analysis', 'No analysis available'))
-        json_str = json.dumps(results, indent=2, ensure_ascii=False)
+        st.markdown(_safe(results.get('legal_analysis', 'No analysis available')))
         st.download_button(
             label="📥 Download Analysis Results (JSON)",
-            data=json_str,
+            data=json_bytes,
             file_name=f"fir_analysis_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
-            mime="application/json"
+            mime="application/json",
+            key=f"download_{slot}"
         )
 
+@st.cache_data(show_spinner=False)
+def _summary_blob(timestamp: str, slot: str, _results: Dict[str, any]):
+    """Summary metrics plus the download JSON, computed once per analysis.
+
+    Keyed by the analysis timestamp plus the rendering slot, with the dict
+    itself left unhashed, so tab switches and other reruns stop re-walking
+    the result and re-serializing the download blob. The slot matters
+    because marshaled batch results share one timestamp; without it every
+    item after the first would hit the first item's entry.
+    """
+    extracted_info = _results.get('extracted_info', {})
+    legal_mapping = _results.get('legal_mapping', {})
+    total_accused = len(extracted_info.get('Accused', []))
+    total_offences = len(extracted_info.get('Offences', []))
+    total_legal_sections = sum(len(sections) for sections in legal_mapping.values())
+    total_acts = sum(1 for sections in legal_mapping.values() if sections)
+    return total_accused, total_offences, total_legal_sections, total_acts, _json_dumps(_results)
+
+@st.cache_resource(show_spinner=False)
+def get_analyzer(api_key: str) -> DharmaFIRAnalyzer:
+    return DharmaFIRAnalyzer(api_key)
+
+class _AnalysisFailed(Exception):
+    """Carries a fallback/error or degraded response out of _cached_analyze.
+
+    Raising (instead of returning the error dict) keeps failures out of
+    the st.cache_data memo, mirroring _write_cached_result's guard: a
+    transient failure should not shadow a later successful analysis for
+    the rest of the TTL window.
+    """
+    def __init__(self, result: Dict[str, any]):
+        super().__init__(result.get("legal_analysis", "analysis failed"))
+        self.result = result
+
+@st.cache_data(ttl=3600, max_entries=256, show_spinner=False)
+def _cached_analyze(fir_hash: str, model_hint: str, fir_text: str, _analyzer: DharmaFIRAnalyzer) -> Dict[str, any]:
+    cached = _read_cached_result(fir_hash)
+    if cached is not None:
+        return cached
+    semantic_cache = get_semantic_cache()
+    embedding = semantic_cache.embed(fir_text)
+    near_match = semantic_cache.lookup(embedding)
+    if near_match is not None:
+        return near_match
+    result = _analyzer.gemini.analyze_with_gemini(fir_text)
+    if result.get("model_used") in (None, "", "none") or result.get("degraded"):
+        raise _AnalysisFailed(result)
+    _write_cached_result(fir_hash, result)
+    semantic_cache.add(embedding, fir_hash)
+    return result
+
 def main():
     load_css()
     st.markdown('<div class="main-header">⚖️ DHARMA FIR Analyzer</div>', unsafe_allow_html=True)
@@ -474,15 +1184,8 @@ def main():
         st.error("Gemini API Key not found. Please set GEMINI_API_KEY in your .env file or Streamlit secrets.")
         st.stop()
 
-    analyzer = DharmaFIRAnalyzer(api_key)
+    analyzer = get_analyzer(api_key)
 
-    sample_fir = """On 5th September 2025, at about 11:45 PM, I, Praveen Kumar, S/o Srinivas Rao, aged 35 years, belonging to BC community, working as a private school teacher, residing at Gandhi Nagar, Hyderabad, was returning home on my Hero Splendor motorcycle (TS-09-FQ-5678). Near the RTC Crossroads, two persons stopped me. One, later identified as Raju Singh, age around 32, resident of Malkajgiri, threatened me with a knife and demanded my wallet and phone. The other, Mohan, S/o Shankar, age 28, hit me on the arm with an iron rod and took my smartwatch worth ₹12,000.
-
-When I tried to shout for help, Raju threatened, "Reporting to police will get you and your family in trouble." Local tea stall owner Ramulu and auto driver Venkatesh witnessed the incident but were afraid to intervene.
-
-During the scuffle, my arm was injured. The accused escaped on a white Activa (TS-10-AB-3210). I suffered mental trauma and fear for my family's safety.
-
-ఈ దాడి వల్ల నాకు గాయాలు అయ్యాయి మరియు నాకు మానసిక భయంతో పాటు ఆస్తి నష్టం కూడా జరిగింది. నేను వెంటనే పోలీసుగా ఫిర్యాదు చేస్తున్నాను."""
     st.markdown('<div class="section-header">📝 FIR Text Input</div>', unsafe_allow_html=True)
     input_method = st.radio(
         "Choose input method:",
@@ -490,7 +1193,7 @@ During the scuffle, my arm was injured. The accused escaped on a white Activa (T
     )
     fir_text = ""
     if input_method == "Use Sample FIR":
-        fir_text = sample_fir
+        fir_text = _SAMPLE_FIR
         st.text_area("FIR Text", fir_text, height=300, key="sample_fir", label_visibility="collapsed")
     else:
         fir_text = st.text_area(
@@ -500,16 +1203,60 @@ During the scuffle, my arm was injured. The accused escaped on a white Activa (T
             key="custom_fir",
             label_visibility="collapsed"
         )
+    force_refresh = st.checkbox("Force refresh (ignore cached analysis)")
     if st.button("🔍 Analyze FIR with Gemini AI", type="primary", use_container_width=True):
         if fir_text.strip():
             with st.spinner("Analyzing FIR text with Gemini AI... This may take 10-20 seconds."):
                 try:
-                    results = analyzer.analyze_fir(fir_text)
-                    analyzer.display_results(results)
+                    st.session_state['last_results'] = analyzer.analyze_fir(
+                        fir_text, force_refresh=force_refresh)
                 except Exception as e:
                     st.error(f"Error during analysis: {str(e)}")
         else:
             st.warning("Please enter FIR text to analyze.")
+    # Rendering from session state keeps the analysis on screen across
+    # reruns (tab switches, widget changes) instead of tying it to the
+    # button press that produced it.
+    if 'last_results' in st.session_state:
+        analyzer.display_results(st.session_state['last_results'])
+    st.markdown('<div class="section-header">📂 Batch Analyze</div>', unsafe_allow_html=True)
+    uploads = st.file_uploader(
+        "Upload multiple FIR text files to analyze them concurrently:",
+        type=["txt"],
+        accept_multiple_files=True,
+    )
+    if uploads and st.button("🗂️ Analyze Uploaded FIRs", use_container_width=True):
+        fir_texts = [upload.read().decode("utf-8", errors="replace") for upload in uploads]
+        with st.spinner(f"Analyzing {len(fir_texts)} FIRs concurrently..."):
+            batch_results = analyzer.gemini.analyze_firs_parallel(fir_texts)
+        for i, (upload, batch_result) in enumerate(zip(uploads, batch_results)):
+            with st.expander(f"📄 {upload.name}"):
+                analyzer.display_results(batch_result, slot=f"batch_{i}")
+    if uploads and st.button("📨 Submit as Batch Job (cheaper, offline)", use_container_width=True):
+        fir_texts = [upload.read().decode("utf-8", errors="replace") for upload in uploads]
+        try:
+            batch_name = analyzer.gemini.submit_batch(fir_texts)
+            st.session_state.setdefault("batch_jobs", []).append(batch_name)
+            st.success(f"Submitted batch job: {batch_name}")
+        except Exception as e:
+            st.error(f"Batch submission failed: {str(e)}")
+    batch_jobs = st.session_state.get("batch_jobs", [])
+    if batch_jobs:
+        st.markdown('<div class="section-header">🗃️ Batch Jobs</div>', unsafe_allow_html=True)
+        for batch_name in batch_jobs:
+            if st.button(f"🔄 Check {batch_name}", key=f"poll_{batch_name}"):
+                try:
+                    state, batch_results = analyzer.gemini.get_batch_results(batch_name)
+                except Exception as e:
+                    st.error(f"Batch poll failed: {str(e)}")
+                    continue
+                if batch_results is None:
+                    st.info(f"{batch_name}: {state}")
+                else:
+                    st.success(f"{batch_name}: {state}")
+                    for i, batch_result in enumerate(batch_results, start=1):
+                        with st.expander(f"📄 FIR {i}"):
+                            analyzer.display_results(batch_result, slot=f"{batch_name}_{i}")
     with st.sidebar:
         st.markdown("### 🏛️ About DHARMA Project")
         st.info("""